@@ -0,0 +1,93 @@
+import os
+import json
+import math
+import time
+import logging
+from collections import deque
+
+TIMEOUT_STORE_FILE = "./wait_timeouts.json"  # 学习到的等待耗时样本（重启后继续使用）
+SAMPLE_WINDOW = 50  # 每个等待步骤保留最近N个样本
+MIN_SAMPLES = 5  # 样本数不足时使用代码中的默认超时（WAIT_TIME）
+TIMEOUT_PERCENTILE = 0.95  # 取样本的高分位数
+TIMEOUT_MARGIN = 1.5  # 在分位数基础上的放大系数
+TIMEOUT_FLOOR = 3  # 学习到的超时下限（秒）
+TIMEOUT_CEILING = None  # 学习到的超时上限（秒）；None表示该等待默认超时（WAIT_TIME）的TIMEOUT_CEILING_FACTOR倍
+TIMEOUT_CEILING_FACTOR = 3  # 未配置上限时，允许健康但较慢的步骤放宽到WAIT_TIME的几倍（仍受任务时间预算约束）
+TIMEOUT_EXTENSION = 2  # 步骤超时后，下一次等待一次性放宽的倍数（不超过上限）
+SAVE_INTERVAL = 30  # 样本写盘的最小间隔（秒）
+logger = logging.getLogger("BookingChecker")
+
+
+class AdaptiveTimeouts:
+    """按等待步骤记录条件满足所用的时间，用滚动高分位数作为下一次等待的超时"""
+
+    def __init__(self, store_file=TIMEOUT_STORE_FILE, floor=TIMEOUT_FLOOR, ceiling=TIMEOUT_CEILING):
+        self.store_file = store_file
+        self.floor = floor
+        self.ceiling = ceiling
+        self.samples = {}  # 步骤名 -> deque(耗时秒数)，只记录成功的等待
+        self.consecutive_timeouts = {}  # 步骤名 -> 连续超时次数（仅内存，不参与分位数、不写盘）
+        self._dirty = False
+        self._last_save = time.monotonic()
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.store_file):
+            return
+        try:
+            with open(self.store_file, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            for step, values in data.items():
+                self.samples[step] = deque((float(value) for value in values), maxlen=SAMPLE_WINDOW)
+        except (OSError, ValueError) as e:
+            logger.warning(f"等待耗时样本读取失败，使用默认超时：{str(e)}")
+
+    def timeout(self, step, default):
+        """返回该步骤本次等待应使用的超时（秒）"""
+        samples = self.samples.get(step)
+        if not samples or len(samples) < MIN_SAMPLES:
+            return default
+        ceiling = default * TIMEOUT_CEILING_FACTOR if self.ceiling is None else self.ceiling
+        ordered = sorted(samples)
+        rank = max(0, math.ceil(TIMEOUT_PERCENTILE * len(ordered)) - 1)
+        learned = ordered[rank] * TIMEOUT_MARGIN
+        # 刚超时一次：下一次放宽一次，避免偶发的慢响应连续失败；再次超时则按页面异常处理，不再放宽
+        if self.consecutive_timeouts.get(step, 0) == 1:
+            learned *= TIMEOUT_EXTENSION
+        return min(ceiling, max(self.floor, learned))
+
+    def record(self, step, seconds):
+        """记录一次成功等待的耗时"""
+        self.consecutive_timeouts.pop(step, None)
+        self.samples.setdefault(step, deque(maxlen=SAMPLE_WINDOW)).append(round(seconds, 3))
+        self._dirty = True
+        if time.monotonic() - self._last_save >= SAVE_INTERVAL:
+            self.save()
+
+    def record_timeout(self, step):
+        """记录一次超时（不作为耗时样本，只影响下一次是否放宽）"""
+        self.consecutive_timeouts[step] = self.consecutive_timeouts.get(step, 0) + 1
+
+    def save(self):
+        if not self._dirty:
+            return
+        try:
+            temp_file = f"{self.store_file}.tmp"
+            with open(temp_file, "w", encoding="utf-8") as f:
+                json.dump({step: list(values) for step, values in self.samples.items()}, f, indent=2)
+            os.replace(temp_file, self.store_file)
+            self._dirty = False
+        except OSError as e:
+            logger.warning(f"等待耗时样本保存失败：{str(e)}")
+        self._last_save = time.monotonic()
+
+
+_learned_timeouts = None
+
+
+def learned_timeouts():
+    """全局共享的学习超时（首次使用时从磁盘加载）"""
+    global _learned_timeouts
+    if _learned_timeouts is None:
+        _learned_timeouts = AdaptiveTimeouts()
+    return _learned_timeouts
@@ -1,12 +1,19 @@
 import os
 import time
 import logging
+import argparse
+from contextlib import nullcontext
 from datetime import datetime
 from openpyxl import load_workbook
 from openpyxl.utils import get_column_letter
 from openpyxl.styles import Font, PatternFill
 
 import webClick
+import roundProfiler
+import adaptiveTimeout
+import networkCapture
+import driverManager
+from taskBudget import Deadline, TaskTimeoutError, TASK_TIME_BUDGET, ROUND_TIME_BUDGET, TASK_START_RESERVE
 
 
 # ---------------------- 1. 日志配置（自动创建日志文件，记录所有输出） ----------------------
@@ -44,6 +51,9 @@ def setup_logger():
 # 初始化日志器（全局使用）
 logger = setup_logger()
 
+# 上一轮因时间预算用尽而停下的行号：下一轮从这一行开始（依次轮转），保证每一行最终都会被处理
+resume_row = None
+
 
 # ---------------------- 2. Excel处理核心函数（使用logger输出日志） ----------------------
 def init_excel_status(excel_path):
@@ -77,7 +87,7 @@ def init_excel_status(excel_path):
         status_col_letter = get_column_letter(status_col)
         logger.info(f"Excel表头校验通过，状态列位于第{status_col}列（{status_col_letter}列）")
         # 新增：将“已有其他时间完成”加入合法状态列表
-        valid_statuses = ["待执行", "执行中", "执行成功", "执行失败", "配置无效", "已有其他时间完成"]
+        valid_statuses = ["待执行", "执行中", "执行成功", "执行失败", "配置无效", "已有其他时间完成", "待重试"]
         for row in range(header_row + 1, worksheet.max_row + 1):
             current_status = worksheet[f"{status_col_letter}{row}"].value
             # 仅重置“非合法状态”的行
@@ -168,7 +178,7 @@ def validate_excel_row(excel_path, header_col_map, row):
 
 def update_excel_status(excel_path, header_col_map, row, status, update_enable_col=False):
     # 新增：将“已有其他时间完成”加入允许的状态列表
-    ALLOWED_STATUSES = ["执行中", "执行成功", "执行失败", "配置无效", "已有其他时间完成"]
+    ALLOWED_STATUSES = ["执行中", "执行成功", "执行失败", "配置无效", "已有其他时间完成", "待重试"]
     if status not in ALLOWED_STATUSES:
         logger.error(f"无效状态值：{status}")
         return False
@@ -185,7 +195,8 @@ def update_excel_status(excel_path, header_col_map, row, status, update_enable_c
             "执行成功": {"fill": "E6F3FF", "font": "0066CC"},
             "执行失败": {"fill": "FFE6E6", "font": "CC0000"},
             "配置无效": {"fill": "F2F2F2", "font": "666666"},
-            "已有其他时间完成": {"fill": "FFF2CC", "font": "FF9900"}  # 新状态样式
+            "已有其他时间完成": {"fill": "FFF2CC", "font": "FF9900"},  # 新状态样式
+            "待重试": {"fill": "E6E6E6", "font": "7F6000"}  # 超出时间预算被取消，下一轮重试
         }
         style = status_styles[status]
         cell.fill = PatternFill(start_color=style["fill"], end_color=style["fill"], fill_type="solid")
@@ -204,24 +215,40 @@ def update_excel_status(excel_path, header_col_map, row, status, update_enable_c
         return False
 
 # ---------------------- 3. 单次检测任务（被循环调用） ----------------------
-def run_single_check(excel_path, header_col_map):
-    """执行一次完整的检测任务（遍历所有行）"""
+def run_single_check(excel_path, header_col_map, capture_network=False):
+    """执行一次完整的检测任务（遍历所有行）；capture_network为True时采集每行的网络请求耗时"""
+    global resume_row
     logger.info("\n" + "=" * 50)
     logger.info("开始新一轮检测任务")
     logger.info("=" * 50)
     # 新增：存储已成功完成预约的驾照编号（单次检测内生效）
     completed_licence_nums = []
+    # Chrome可能在运行期间自动更新：每轮检查一次版本，必要时重新准备chromedriver
+    driverManager.refresh()
+    # 本轮时间预算：超出后剩余行留到下一轮，避免单轮无限拉长
+    round_deadline = Deadline(ROUND_TIME_BUDGET, "本轮检测")
     try:
         workbook = load_workbook(excel_path, read_only=False, data_only=False)
         worksheet = workbook.active
         header_row = 1
         total_rows = worksheet.max_row
-        # 遍历所有数据行
-        for row in range(header_row + 1, total_rows + 1):
+        # 从上一轮中断的行开始，转一圈遍历所有数据行
+        start_row = resume_row if resume_row and header_row < resume_row <= total_rows else header_row + 1
+        resume_row = None
+        row_order = list(range(start_row, total_rows + 1)) + list(range(header_row + 1, start_row))
+        if start_row != header_row + 1:
+            logger.info(f"上一轮在第{start_row}行因时间预算中断，本轮从第{start_row}行开始")
+        # 轮转后「已完成」的行不一定先于同驾照的其他行被遍历，先收集已完成的驾照编号
+        enable_col_letter = get_column_letter(header_col_map["是否开启检测预约"])
+        for row in row_order:
+            if str(worksheet[f"{enable_col_letter}{row}"].value).strip() == "已完成" and worksheet[f"A{row}"].value:
+                completed_licence_nums.append(str(worksheet[f"A{row}"].value).strip())
+        for row in row_order:
             logger.info(f"\n--- 处理第{row}行任务 ---")
             # 新增：1. 读取当前行驾照编号，先校验是否已存在成功记录
             current_dl_num = str(worksheet[f"A{row}"].value).strip() if worksheet[f"A{row}"].value else ""
-            if current_dl_num in completed_licence_nums:
+            own_enable = str(worksheet[f"{enable_col_letter}{row}"].value).strip()
+            if current_dl_num in completed_licence_nums and own_enable != "已完成":
                 logger.info(f"第{row}行驾照编号[{current_dl_num}]已存在成功预约，标记为「已有其他时间完成」")
                 update_excel_status(excel_path, header_col_map, row, "已有其他时间完成")
                 continue  # 跳过后续处理
@@ -240,6 +267,12 @@ def run_single_check(excel_path, header_col_map):
                 logger.info(f"第{row}行状态为「{row_config['enable_check']}」，跳过处理")
                 continue
 
+            # 本轮剩余时间不足以启动浏览器时不再开始新任务，该行及之后的行留到下一轮
+            if round_deadline.remaining() < TASK_START_RESERVE:
+                logger.warning(f"本轮时间预算（{ROUND_TIME_BUDGET}秒）即将用尽，第{row}行及之后的任务留到下一轮")
+                resume_row = row
+                break
+
             # 原有逻辑：4. 标记为执行中
             update_success = update_excel_status(excel_path, header_col_map, row, "执行中")
             if not update_success:
@@ -268,6 +301,7 @@ def run_single_check(excel_path, header_col_map):
 
             # 原有逻辑：6. 执行检测任务
             task_success = False
+            task_deadline = Deadline(TASK_TIME_BUDGET, f"第{row}行任务", parent=round_deadline)
             try:
                 logger.info(
                     f"执行检测（日期：{row_config['start_date']}~{row_config['end_date']}，时间：{row_config['daily_start_time']}~{row_config['daily_end_time']}）")
@@ -276,8 +310,15 @@ def run_single_check(excel_path, header_col_map):
                     end_date=row_config['end_date'],
                     daily_start_time=row_config['daily_start_time'],
                     daily_end_time=row_config['daily_end_time'],
-                    config_data=config_data
+                    config_data=config_data,
+                    deadline=task_deadline,
+                    capture_network=capture_network
                 )
+            except TaskTimeoutError as e:
+                # 超出时间预算：浏览器已在openweb中关闭，标记为待重试而不是执行失败
+                logger.warning(f"{e}，标记为「待重试」")
+                update_excel_status(excel_path, header_col_map, row, "待重试")
+                continue
             except Exception as e:
                 logger.error(f"检测任务异常：{str(e)}")
                 task_success = False
@@ -307,8 +348,8 @@ def run_single_check(excel_path, header_col_map):
                     # 读取其他行的当前状态
                     other_status_col_letter = get_column_letter(header_col_map["状态"])
                     other_current_status = worksheet[f"{other_status_col_letter}{other_row}"].value
-                    # 条件：驾照编号相同 + 状态为“待执行”或“执行中”
-                    if other_dl_num == current_dl_num and other_current_status in ["待执行", "执行中"]:
+                    # 条件：驾照编号相同 + 状态为“待执行”、“执行中”或“待重试”
+                    if other_dl_num == current_dl_num and other_current_status in ["待执行", "执行中", "待重试"]:
                         logger.info(f"第{other_row}行同驾照[{current_dl_num}]，更新为「已有其他时间完成」")
                         # 更新状态（无需修改“是否开启检测预约”列）
                         update_excel_status(
@@ -329,7 +370,11 @@ def run_single_check(excel_path, header_col_map):
         except:
             pass
 # ---------------------- 4. 主循环（每分钟执行一次） ----------------------
-def main():
+def main(profile=False, capture_network=False):
+    """
+    :param profile: 是否开启性能分析模式（每轮输出cProfile、tracemalloc快照和WebDriver命令统计）
+    :param capture_network: 是否采集网络请求耗时（每个浏览器会话输出HAR文件，每轮输出服务器/传输/渲染耗时汇总）
+    """
     # 配置Excel路径和循环间隔
     EXCEL_PATH = "./预约配置表.xlsx"  # 替换为你的Excel路径
     CHECK_INTERVAL = 60  # 循环间隔（秒）
@@ -344,10 +389,19 @@ def main():
     # 开始循环检测
     logger.info(f"\n=== 开始循环检测（每{CHECK_INTERVAL}秒一次）===")
     logger.info("=== 按 Ctrl+C 可停止程序 ===")
+    if profile:
+        logger.info(f"=== 性能分析模式已开启，结果输出到 {roundProfiler.PROFILE_DIR} ===")
+    if capture_network:
+        logger.info(f"=== 网络耗时采集已开启，结果输出到 {networkCapture.HAR_OUTPUT_DIR} ===")
     try:
         while True:
-            # 执行一次检测任务
-            run_single_check(EXCEL_PATH, header_col_map)
+            # 执行一次检测任务（性能分析模式下记录本轮的profile）
+            with roundProfiler.RoundProfiler() if profile else nullcontext():
+                run_single_check(EXCEL_PATH, header_col_map, capture_network=capture_network)
+            # 保存本轮学习到的各步骤等待耗时（重启后继续使用）
+            adaptiveTimeout.learned_timeouts().save()
+            if capture_network:
+                networkCapture.write_round_summary()
 
             # 等待指定时间（下次检测前）
             logger.info(f"\n等待{CHECK_INTERVAL}秒后进行下一轮检测...\n")
@@ -356,8 +410,14 @@ def main():
     except KeyboardInterrupt:
         # 捕获Ctrl+C，优雅退出
         logger.info("\n=== 用户中断程序 ===")
+        # 保存中断前学习到的等待耗时，避免丢失最近的样本
+        adaptiveTimeout.learned_timeouts().save()
         logger.info("程序已停止运行")
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="驾驶考试预约检测")
+    parser.add_argument("--profile", action="store_true", help="开启性能分析模式（每轮输出到profile_output目录）")
+    parser.add_argument("--capture-network", action="store_true", help="采集网络请求耗时（输出到har_output目录）")
+    args = parser.parse_args()
+    main(profile=args.profile, capture_network=args.capture_network)
\ No newline at end of file
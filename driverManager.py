@@ -0,0 +1,180 @@
+import os
+import re
+import sys
+import time
+import shutil
+import logging
+import subprocess
+
+# chromedriver配置（按平台区分，环境变量优先）
+DRIVER_CONFIG = {
+    # 已准备好的chromedriver路径：填写后直接使用，不再下载和打补丁（环境变量 CHROMEDRIVER_PATH）
+    "driver_path": {
+        "win32": "",
+        "linux": "",
+        "darwin": "",
+    },
+    # 补丁后的chromedriver缓存目录，按Chrome主版本号分子目录（环境变量 CHROMEDRIVER_CACHE_DIR）
+    "cache_dir": {
+        "win32": os.path.join(os.environ.get("LOCALAPPDATA", os.path.expanduser("~")), "excelWebClick", "chromedriver"),
+        "linux": os.path.expanduser("~/.cache/excelWebClick/chromedriver"),
+        "darwin": os.path.expanduser("~/Library/Caches/excelWebClick/chromedriver"),
+    },
+    # 用于读取Chrome版本号的可执行文件（Windows从注册表读取）
+    "chrome_binaries": {
+        "linux": ["google-chrome", "google-chrome-stable", "chromium", "chromium-browser"],
+        "darwin": ["/Applications/Google Chrome.app/Contents/MacOS/Google Chrome"],
+    },
+}
+LOCK_TIMEOUT = 300  # 缓存锁超时（秒），超过视为其他进程异常退出留下的锁
+VERSION_PATTERN = re.compile(r"(\d+)\.\d+\.\d+\.\d+")
+logger = logging.getLogger("BookingChecker")
+
+_resolved_driver = None  # 已解析的 (driver路径, Chrome主版本号)；Chrome版本变化或启动失败时清除
+_resolve_failed = False  # 本轮解析已失败（版本读取/缓存准备失败），本轮内不再重复探测
+
+
+def _platform_key():
+    if sys.platform.startswith("win"):
+        return "win32"
+    if sys.platform == "darwin":
+        return "darwin"
+    return "linux"
+
+
+def _driver_filename():
+    return "chromedriver.exe" if _platform_key() == "win32" else "chromedriver"
+
+
+def detect_chrome_version():
+    """读取本机Chrome的主版本号，读取失败返回None"""
+    platform_key = _platform_key()
+    if platform_key == "win32":
+        commands = [["reg", "query", r"HKEY_CURRENT_USER\Software\Google\Chrome\BLBeacon", "/v", "version"]]
+    else:
+        commands = [[binary, "--version"] for binary in DRIVER_CONFIG["chrome_binaries"][platform_key]]
+    for command in commands:
+        try:
+            output = subprocess.run(command, capture_output=True, text=True, timeout=10).stdout
+        except (OSError, subprocess.SubprocessError):
+            continue
+        match = VERSION_PATTERN.search(output)
+        if match:
+            return int(match.group(1))
+    return None
+
+
+class _CacheLock:
+    """跨进程的文件锁（O_EXCL创建锁文件），避免多个进程同时下载/打补丁"""
+
+    def __init__(self, lock_path, timeout=LOCK_TIMEOUT):
+        self.lock_path = lock_path
+        self.timeout = timeout
+
+    def __enter__(self):
+        started = time.monotonic()
+        while True:
+            try:
+                fd = os.open(self.lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                os.write(fd, str(os.getpid()).encode())
+                os.close(fd)
+                return self
+            except FileExistsError:
+                try:
+                    if time.time() - os.path.getmtime(self.lock_path) > self.timeout:
+                        logger.warning(f"清理过期的chromedriver缓存锁：{self.lock_path}")
+                        os.remove(self.lock_path)
+                        continue
+                except OSError:
+                    continue  # 锁刚被释放
+                if time.monotonic() - started > self.timeout:
+                    raise TimeoutError(f"等待chromedriver缓存锁超时：{self.lock_path}")
+                time.sleep(0.5)
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        try:
+            os.remove(self.lock_path)
+        except OSError:
+            pass
+        return False
+
+
+def _prepare_driver(version_main, target_path):
+    """用undetected_chromedriver下载并打补丁，然后复制到缓存路径"""
+    from undetected_chromedriver.patcher import Patcher
+
+    patcher = Patcher(version_main=version_main)
+    patcher.auto()
+    temp_path = f"{target_path}.{os.getpid()}.tmp"
+    shutil.copy2(patcher.executable_path, temp_path)
+    os.chmod(temp_path, 0o755)
+    os.replace(temp_path, target_path)  # 原子替换，其他进程不会读到半个文件
+
+
+def refresh():
+    """
+    每轮开始时调用：Chrome在运行期间自动更新后，丢弃为旧版本解析的driver；并清除上一轮的解析失败标记
+    """
+    global _resolved_driver, _resolve_failed
+    _resolve_failed = False
+    if _resolved_driver is None or _resolved_driver[1] is None:
+        return  # 未解析，或使用的是配置的driver路径
+    version_main = detect_chrome_version()
+    if version_main is not None and version_main != _resolved_driver[1]:
+        logger.info(f"Chrome版本已从 {_resolved_driver[1]} 变为 {version_main}，重新准备chromedriver")
+        _resolved_driver = None
+
+
+def invalidate():
+    """浏览器启动失败（如driver与Chrome版本不匹配）时调用，下次启动重新解析"""
+    global _resolved_driver, _resolve_failed
+    _resolved_driver = None
+    _resolve_failed = False
+
+
+def get_driver():
+    """
+    获取可直接使用的chromedriver
+    :return: (driver路径, Chrome主版本号)；无法解析时返回 (None, None)，由undetected_chromedriver自行处理
+    """
+    global _resolved_driver, _resolve_failed
+    if _resolved_driver is not None:
+        return _resolved_driver
+    if _resolve_failed:
+        return None, None
+
+    platform_key = _platform_key()
+    configured_path = os.environ.get("CHROMEDRIVER_PATH") or DRIVER_CONFIG["driver_path"][platform_key]
+    if configured_path:
+        if os.path.exists(configured_path):
+            _resolved_driver = (configured_path, None)
+            return _resolved_driver
+        logger.warning(f"配置的chromedriver不存在：{configured_path}，改为自动准备")
+
+    version_main = detect_chrome_version()
+    if version_main is None:
+        logger.warning("未能读取Chrome版本号，本轮由undetected_chromedriver自动准备chromedriver")
+        _resolve_failed = True
+        return None, None
+
+    cache_dir = os.path.join(
+        os.environ.get("CHROMEDRIVER_CACHE_DIR") or DRIVER_CONFIG["cache_dir"][platform_key],
+        str(version_main)
+    )
+    driver_path = os.path.join(cache_dir, _driver_filename())
+    if not os.path.exists(driver_path):
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            with _CacheLock(os.path.join(cache_dir, ".lock")):
+                # 拿到锁后再检查一次：可能已被其他进程准备好
+                if not os.path.exists(driver_path):
+                    started = time.perf_counter()
+                    _prepare_driver(version_main, driver_path)
+                    logger.info(f"已准备Chrome {version_main} 的chromedriver（耗时{time.perf_counter() - started:.1f}秒）：{driver_path}")
+        except Exception as e:
+            logger.error(f"chromedriver缓存准备失败：{str(e)}，本轮由undetected_chromedriver自动准备")
+            _resolve_failed = True
+            return None, None
+
+    _resolved_driver = (driver_path, version_main)
+    return _resolved_driver
@@ -0,0 +1,318 @@
+import os
+import re
+import csv
+import bz2
+import sys
+import glob
+import gzip
+import json
+import argparse
+from datetime import datetime
+
+DEFAULT_LOG_FILE = "booking_logs.log"
+LINE_PATTERN = re.compile(r"^(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}) \[(\w+)\] ?(.*)$")
+ROW_START_PATTERN = re.compile(r"处理第(\d+)行任务")
+ROW_STATUS_PATTERN = re.compile(r"第(\d+)行状态已更新为：「(.+?)」")
+ROUND_START_MARKER = "开始新一轮检测任务"
+ROW_SKIP_MARKER = "跳过处理"
+HISTOGRAM_BUCKETS = [0.5, 1, 2, 5, 10, 20, 30, 60, 120, float("inf")]  # 直方图桶上界（秒）
+
+# 流程阶段（按执行顺序）：阶段名、成功标记、失败标记
+# 阶段耗时 = 本阶段标记时间 - 上一个标记时间
+PHASES = [
+    ("excel_prepare", ["执行检测（"], []),
+    ("browser_launch", ["已启动隐藏自动化特征的浏览器"], []),
+    ("licence_input", ["已输入驾照编号"], []),
+    ("contact_input", ["已输入手机号"], []),  # 新日志中与驾照编号合并为一行，此阶段仅出现在旧日志里
+    ("test_type", ["考试类型选择成功"], ["考试类型选择失败"]),
+    ("region", ["地区选择成功"], ["地区选择失败"]),
+    ("centre", ["考试中心选择成功"], ["考试中心选择失败"]),
+    ("slot_table", ["等待预约时间表格加载"], []),
+    ("slot_select", ["已选择最早时段"], ["指定范围内无符合条件的时段", "未在指定范围内找到可用时段", "时间选择错误"]),
+    ("email_input", ["已输入邮箱"], []),
+    ("payment_input", ["已填写付款信息"], []),
+    ("payment_review", ["已点击付款审核按钮"], []),
+    ("payment", ["付款成功"], ["付款流程异常"]),
+]
+PHASE_NAMES = [name for name, _, _ in PHASES]
+# 不属于特定阶段的失败标记：记为“上一个已完成阶段”之后的那个阶段失败（每行只记一次）
+GENERIC_FAILURE_MARKERS = ["脚本出错", "检测任务异常", "超出时间预算"]
+
+
+def find_log_segments(log_file):
+    """
+    查找日志及其轮转分段（booking_logs.log.1、booking_logs.log.2.gz 等），按从旧到新排序
+    """
+    def _segment_index(path):
+        suffix = path[len(log_file):].lstrip(".")
+        number = suffix.split(".")[0]
+        return int(number) if number.isdigit() else 0
+
+    segments = [path for path in glob.glob(f"{glob.escape(log_file)}.*") if _segment_index(path) > 0]
+    segments.sort(key=_segment_index, reverse=True)
+    if os.path.exists(log_file):
+        segments.append(log_file)
+    return segments
+
+
+def open_log_segment(path):
+    """按扩展名打开日志分段（支持 .gz / .bz2 压缩）"""
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8", errors="replace")
+    if path.endswith(".bz2"):
+        return bz2.open(path, "rt", encoding="utf-8", errors="replace")
+    return open(path, "r", encoding="utf-8", errors="replace")
+
+
+def iter_log_lines(paths):
+    """
+    逐行读取日志，产出 (时间, 文本)
+    多行日志（如以换行开头的消息、异常堆栈）的续行沿用上一条带时间戳记录的时间
+    """
+    last_time = None
+    for path in paths:
+        with open_log_segment(path) as f:
+            for line in f:
+                line = line.rstrip("\n")
+                match = LINE_PATTERN.match(line)
+                if match:
+                    last_time = datetime.strptime(match.group(1), "%Y-%m-%d %H:%M:%S")
+                    text = match.group(3)
+                else:
+                    text = line
+                if last_time is not None and text.strip():
+                    yield last_time, text
+
+
+class RowRecord:
+    """单行任务在一轮中的执行记录"""
+
+    def __init__(self, round_start, row, start_time):
+        self.round_start = round_start
+        self.row = row
+        self.start_time = start_time
+        self.last_mark = start_time
+        self.last_phase_index = -1
+        self.phases = {}  # 阶段名 -> (耗时秒数, "成功"/"失败")
+        self.final_status = ""
+        self.end_time = start_time
+        self.task_start = start_time  # 「执行检测」开始时间（此前为Excel读写耗时）
+
+    def mark_phase(self, phase_index, timestamp, outcome):
+        name = PHASE_NAMES[phase_index]
+        if name in self.phases:
+            return
+        self.phases[name] = ((timestamp - self.last_mark).total_seconds(), outcome)
+        if name == "excel_prepare":
+            self.task_start = timestamp
+        self.last_mark = timestamp
+        self.last_phase_index = max(self.last_phase_index, phase_index)
+
+    def total_seconds(self):
+        return (self.end_time - self.start_time).total_seconds()
+
+    def to_csv_row(self):
+        values = [
+            self.round_start.strftime("%Y-%m-%d %H:%M:%S") if self.round_start else "",
+            self.row,
+            self.final_status,
+            f"{self.total_seconds():.0f}",
+        ]
+        for name in PHASE_NAMES:
+            seconds, outcome = self.phases.get(name, ("", ""))
+            values.extend([f"{seconds:.0f}" if seconds != "" else "", outcome])
+        return values
+
+
+def csv_header():
+    header = ["round_start", "row", "final_status", "total_seconds"]
+    for name in PHASE_NAMES:
+        header.extend([f"{name}_seconds", f"{name}_outcome"])
+    return header
+
+
+class PhaseStats:
+    """单个阶段的聚合统计（固定内存：计数 + 直方图）"""
+
+    def __init__(self):
+        self.success = 0
+        self.failure = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.histogram = [0] * len(HISTOGRAM_BUCKETS)
+
+    def add(self, seconds, outcome):
+        if outcome == "成功":
+            self.success += 1
+        else:
+            self.failure += 1
+        self.total_seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+        for index, upper in enumerate(HISTOGRAM_BUCKETS):
+            if seconds <= upper:
+                self.histogram[index] += 1
+                break
+
+    def count(self):
+        return self.success + self.failure
+
+    def to_dict(self):
+        count = self.count()
+        return {
+            "success": self.success,
+            "failure": self.failure,
+            "mean_seconds": round(self.total_seconds / count, 2) if count else 0,
+            "max_seconds": self.max_seconds,
+            "histogram": {bucket_label(index): value for index, value in enumerate(self.histogram)},
+        }
+
+
+def bucket_label(index):
+    upper = HISTOGRAM_BUCKETS[index]
+    lower = HISTOGRAM_BUCKETS[index - 1] if index > 0 else 0
+    return f">{lower:g}s" if upper == float("inf") else f"{lower:g}-{upper:g}s"
+
+
+class LogAnalyzer:
+    """流式解析booking_logs.log，重建每行任务的阶段耗时与结果"""
+
+    def __init__(self, row_callback=None):
+        self.row_callback = row_callback  # 每完成一行记录时回调（用于流式导出CSV）
+        self.phase_stats = {name: PhaseStats() for name in PHASE_NAMES}
+        self.task_stats = PhaseStats()  # 执行检测任务的整体耗时
+        self.status_counts = {}
+        self.rounds = 0
+        self.rows = 0
+        self._round_start = None
+        self._current = None
+
+    def feed(self, timestamp, text):
+        if ROUND_START_MARKER in text:
+            self._finish_row("未完成")
+            self.rounds += 1
+            self._round_start = timestamp
+            return
+
+        row_match = ROW_START_PATTERN.search(text)
+        if row_match:
+            self._finish_row("未完成")
+            self._current = RowRecord(self._round_start, int(row_match.group(1)), timestamp)
+            return
+
+        current = self._current
+        if current is None:
+            return
+        current.end_time = timestamp
+
+        status_match = ROW_STATUS_PATTERN.search(text)
+        if status_match and int(status_match.group(1)) == current.row:
+            status = status_match.group(2)
+            if status != "执行中":
+                self._finish_row(status)
+            return
+        if ROW_SKIP_MARKER in text:
+            self._finish_row("跳过")
+            return
+
+        for index, (_, success_markers, failure_markers) in enumerate(PHASES):
+            if any(marker in text for marker in success_markers):
+                current.mark_phase(index, timestamp, "成功")
+                return
+            if any(marker in text for marker in failure_markers):
+                current.mark_phase(index, timestamp, "失败")
+                return
+        already_failed = any(outcome == "失败" for _, outcome in current.phases.values())
+        if not already_failed and any(marker in text for marker in GENERIC_FAILURE_MARKERS):
+            failed_index = min(current.last_phase_index + 1, len(PHASES) - 1)
+            current.mark_phase(failed_index, timestamp, "失败")
+
+    def _finish_row(self, status):
+        current = self._current
+        if current is None:
+            return
+        self._current = None
+        current.final_status = status
+        self.rows += 1
+        self.status_counts[status] = self.status_counts.get(status, 0) + 1
+        for name, (seconds, outcome) in current.phases.items():
+            self.phase_stats[name].add(seconds, outcome)
+        if current.phases:
+            task_outcome = "成功" if status == "执行成功" else "失败"
+            self.task_stats.add((current.end_time - current.task_start).total_seconds(), task_outcome)
+        if self.row_callback:
+            self.row_callback(current)
+
+    def finish(self):
+        """日志读完后收尾（最后一行可能仍在执行中）"""
+        self._finish_row("未完成")
+
+    def summary(self):
+        return {
+            "rounds": self.rounds,
+            "rows": self.rows,
+            "final_status": self.status_counts,
+            "task": self.task_stats.to_dict(),
+            "phases": {name: stats.to_dict() for name, stats in self.phase_stats.items() if stats.count()},
+        }
+
+
+def format_report(summary):
+    lines = [
+        f"检测轮数：{summary['rounds']}，处理行数：{summary['rows']}",
+        "最终状态：" + "，".join(f"{status} {count}" for status, count in summary["final_status"].items()),
+        "",
+        f"{'阶段':<16}{'成功':>6}{'失败':>6}{'平均(s)':>10}{'最大(s)':>10}  直方图",
+    ]
+    phases = dict(summary["phases"])
+    phases["task_total"] = summary["task"]
+    for name, stats in phases.items():
+        histogram = " ".join(f"{label}:{count}" for label, count in stats["histogram"].items() if count)
+        lines.append(
+            f"{name:<16}{stats['success']:>6}{stats['failure']:>6}"
+            f"{stats['mean_seconds']:>10}{stats['max_seconds']:>10g}  {histogram}"
+        )
+    return "\n".join(lines)
+
+
+def analyze(paths, csv_path=None):
+    """解析日志分段；指定csv_path时逐行写出每行任务的阶段耗时"""
+    csv_file = None
+    try:
+        if csv_path:
+            csv_file = open(csv_path, "w", newline="", encoding="utf-8-sig")
+            writer = csv.writer(csv_file)
+            writer.writerow(csv_header())
+            analyzer = LogAnalyzer(row_callback=lambda record: writer.writerow(record.to_csv_row()))
+        else:
+            analyzer = LogAnalyzer()
+        for timestamp, text in iter_log_lines(paths):
+            analyzer.feed(timestamp, text)
+        analyzer.finish()
+        return analyzer.summary()
+    finally:
+        if csv_file:
+            csv_file.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="分析booking_logs.log，统计每行任务各阶段的耗时与结果")
+    parser.add_argument("logs", nargs="*", help="日志文件（默认：booking_logs.log及其轮转/压缩分段）")
+    parser.add_argument("--csv", dest="csv_path", help="导出每行任务的阶段耗时到CSV")
+    parser.add_argument("--json", dest="json_path", help="导出汇总统计（直方图、成功/失败次数）到JSON")
+    args = parser.parse_args(argv)
+
+    paths = args.logs or find_log_segments(DEFAULT_LOG_FILE)
+    if not paths:
+        print(f"未找到日志文件：{DEFAULT_LOG_FILE}")
+        return 1
+
+    summary = analyze(paths, csv_path=args.csv_path)
+    print(format_report(summary))
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,248 @@
+import os
+import json
+import time
+import logging
+from datetime import datetime, timezone
+
+HAR_OUTPUT_DIR = "./har_output"  # 每个浏览器会话的HAR文件与每轮汇总的输出目录
+logger = logging.getLogger("BookingChecker")
+
+_round_sessions = []  # 本轮各会话的分步骤汇总，由 write_round_summary 汇总后清空
+
+
+def enable_performance_log(chrome_options):
+    """开启Chrome性能日志（包含DevTools Network事件），需在启动浏览器前调用"""
+    chrome_options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+
+
+def _iso_time(epoch_seconds):
+    return datetime.fromtimestamp(epoch_seconds, tz=timezone.utc).isoformat().replace("+00:00", "Z")
+
+
+def _span(timing, start_key, end_key):
+    """ResourceTiming中两个时间点的间隔（毫秒），缺失时按HAR约定返回-1"""
+    start, end = timing.get(start_key, -1), timing.get(end_key, -1)
+    return round(end - start, 3) if start >= 0 and end >= start else -1
+
+
+class NetworkCapture:
+    """
+    收集一次浏览器会话的网络请求耗时，并归属到当前流程步骤
+    用法：在触发请求的操作前调用 begin_step("步骤名")，会话结束时调用 close()
+    enabled=False 时所有方法为空操作
+    """
+
+    def __init__(self, driver, enabled=True, output_dir=HAR_OUTPUT_DIR):
+        self.driver = driver
+        self.enabled = enabled
+        self.output_dir = output_dir
+        self.requests = {}  # requestId -> 请求记录
+        self.steps = []  # [步骤名, 开始时间, 结束时间]（epoch秒）
+        self.closed = False
+
+    def begin_step(self, step):
+        if not self.enabled or self.closed:
+            return
+        self.collect()  # 先把已产生的事件归到上一步骤
+        now = time.time()
+        if self.steps:
+            self.steps[-1][2] = now
+        self.steps.append([step, now, None])
+
+    def collect(self):
+        """读取并清空浏览器端积累的性能日志"""
+        try:
+            log_entries = self.driver.get_log("performance")
+        except Exception as e:
+            logger.warning(f"读取浏览器性能日志失败：{str(e)}")
+            return
+        for log_entry in log_entries:
+            try:
+                self.feed(json.loads(log_entry["message"])["message"])
+            except (KeyError, ValueError):
+                continue
+
+    def feed(self, message):
+        """处理一条DevTools事件（Network.*）"""
+        method = message.get("method", "")
+        params = message.get("params", {})
+        request_id = params.get("requestId")
+        if not method.startswith("Network.") or request_id is None:
+            return
+
+        if method == "Network.requestWillBeSent":
+            if request_id in self.requests:
+                return  # 重定向沿用同一requestId，保留首次请求
+            self.requests[request_id] = {
+                "step": self.steps[-1][0] if self.steps else "",
+                "url": params.get("request", {}).get("url", ""),
+                "method": params.get("request", {}).get("method", ""),
+                "type": params.get("type", ""),
+                "wall_time": params.get("wallTime"),
+                "start_timestamp": params.get("timestamp"),
+                "end_timestamp": None,
+                "status": 0,
+                "mime_type": "",
+                "timing": None,
+                "encoded_bytes": 0,
+                "failed": False,
+            }
+            return
+
+        request = self.requests.get(request_id)
+        if request is None:
+            return
+        if method == "Network.responseReceived":
+            response = params.get("response", {})
+            request["status"] = response.get("status", 0)
+            request["mime_type"] = response.get("mimeType", "")
+            request["timing"] = response.get("timing")
+        elif method == "Network.loadingFinished":
+            request["end_timestamp"] = params.get("timestamp")
+            request["encoded_bytes"] = params.get("encodedDataLength", 0)
+        elif method == "Network.loadingFailed":
+            request["end_timestamp"] = params.get("timestamp")
+            request["failed"] = True
+
+    @staticmethod
+    def request_timings(request):
+        """
+        把DevTools的ResourceTiming换算成HAR的timings（毫秒）
+        wait：发送完成到收到响应头（服务器耗时）；receive：响应头到加载完成（传输耗时）
+        """
+        timing = request["timing"]
+        total = -1
+        if request["end_timestamp"] is not None and request["start_timestamp"] is not None:
+            total = (request["end_timestamp"] - request["start_timestamp"]) * 1000
+        if not timing:
+            return {"blocked": -1, "dns": -1, "connect": -1, "ssl": -1, "send": -1, "wait": -1, "receive": -1}, total
+        # timing中各字段为相对requestTime的毫秒数；blocked为开始网络活动之前的排队时间
+        blocked = next((timing[key] for key in ("dnsStart", "connectStart", "sendStart") if timing.get(key, -1) >= 0), -1)
+        receive = -1
+        if request["end_timestamp"] is not None:
+            receive = (request["end_timestamp"] - timing["requestTime"]) * 1000 - timing.get("receiveHeadersEnd", 0)
+        timings = {
+            "blocked": round(blocked, 3),
+            "dns": _span(timing, "dnsStart", "dnsEnd"),
+            "connect": _span(timing, "connectStart", "connectEnd"),
+            "ssl": _span(timing, "sslStart", "sslEnd"),
+            "send": _span(timing, "sendStart", "sendEnd"),
+            "wait": _span(timing, "sendEnd", "receiveHeadersEnd"),
+            "receive": round(receive, 3) if receive >= 0 else -1,
+        }
+        return timings, total
+
+    def step_summary(self):
+        """
+        每个步骤的耗时拆分（秒）：
+        server 服务器耗时之和，transfer 传输耗时之和，
+        render 步骤内没有网络请求在进行的时间（浏览器渲染/脚本及自动化本身的开销）
+        """
+        summary = {}
+        intervals = {}
+        for step, started, ended in self.steps:
+            summary.setdefault(step, {"requests": 0, "server": 0.0, "transfer": 0.0, "render": 0.0, "wall": 0.0})
+            summary[step]["wall"] += (ended or started) - started
+        for request in self.requests.values():
+            step_stats = summary.get(request["step"])
+            if step_stats is None:
+                continue
+            timings, total = self.request_timings(request)
+            step_stats["requests"] += 1
+            step_stats["server"] += max(timings["wait"], 0) / 1000
+            step_stats["transfer"] += max(timings["receive"], 0) / 1000
+            if request["wall_time"] is not None and total >= 0:
+                intervals.setdefault(request["step"], []).append(
+                    (request["wall_time"], request["wall_time"] + total / 1000)
+                )
+        for step, step_stats in summary.items():
+            busy = 0.0
+            current_start = current_end = None
+            for start, end in sorted(intervals.get(step, [])):
+                if current_end is None or start > current_end:
+                    if current_end is not None:
+                        busy += current_end - current_start
+                    current_start, current_end = start, end
+                else:
+                    current_end = max(current_end, end)
+            if current_end is not None:
+                busy += current_end - current_start
+            step_stats["render"] = max(0.0, step_stats["wall"] - busy)
+            for key in ("server", "transfer", "render", "wall"):
+                step_stats[key] = round(step_stats[key], 3)
+        return summary
+
+    def to_har(self):
+        """导出精简的HAR（不含请求/响应头与内容）"""
+        pages = [
+            {"id": step, "title": step, "startedDateTime": _iso_time(started), "pageTimings": {}}
+            for step, started, _ in self.steps
+        ]
+        entries = []
+        for request in self.requests.values():
+            timings, total = self.request_timings(request)
+            entries.append({
+                "pageref": request["step"],
+                "startedDateTime": _iso_time(request["wall_time"]) if request["wall_time"] else "",
+                "time": round(total, 3),
+                "request": {"method": request["method"], "url": request["url"]},
+                "response": {
+                    "status": request["status"],
+                    "content": {"mimeType": request["mime_type"], "size": request["encoded_bytes"]},
+                },
+                "timings": timings,
+                "_resourceType": request["type"],
+                "_failed": request["failed"],
+            })
+        return {"log": {"version": "1.2", "creator": {"name": "excelWebClick", "version": "1.0"},
+                        "pages": pages, "entries": entries}}
+
+    def close(self):
+        """收尾：读取剩余事件、写出HAR文件并登记本会话汇总（需在driver.quit()之前调用，可重复调用）"""
+        if not self.enabled or self.closed:
+            return
+        self.collect()
+        self.closed = True
+        if self.steps:
+            self.steps[-1][2] = time.time()
+        summary = self.step_summary()
+        _round_sessions.append(summary)
+        try:
+            os.makedirs(self.output_dir, exist_ok=True)
+            har_path = os.path.join(self.output_dir, datetime.now().strftime("session_%Y%m%d_%H%M%S_%f.har"))
+            with open(har_path, "w", encoding="utf-8") as f:
+                json.dump(self.to_har(), f, ensure_ascii=False)
+            logger.info(f"网络耗时已保存：{har_path}（{len(self.requests)}个请求）")
+        except OSError as e:
+            logger.error(f"HAR文件写入失败：{str(e)}")
+
+
+def write_round_summary(output_dir=HAR_OUTPUT_DIR):
+    """汇总本轮所有会话的分步骤耗时（服务器/传输/渲染），写入文件并输出日志"""
+    if not _round_sessions:
+        return None
+    totals = {}
+    for session in _round_sessions:
+        for step, stats in session.items():
+            step_totals = totals.setdefault(step, {"sessions": 0, "requests": 0, "server": 0.0,
+                                                   "transfer": 0.0, "render": 0.0, "wall": 0.0})
+            step_totals["sessions"] += 1
+            for key in ("requests", "server", "transfer", "render", "wall"):
+                step_totals[key] += stats[key]
+    _round_sessions.clear()
+
+    for step, step_totals in totals.items():
+        for key in ("server", "transfer", "render", "wall"):
+            step_totals[key] = round(step_totals[key], 3)
+        logger.info(
+            f"网络耗时[{step}]：服务器{step_totals['server']}秒，传输{step_totals['transfer']}秒，"
+            f"渲染/其他{step_totals['render']}秒（{step_totals['requests']}个请求，{step_totals['sessions']}次会话）"
+        )
+    try:
+        os.makedirs(output_dir, exist_ok=True)
+        summary_path = os.path.join(output_dir, datetime.now().strftime("round_%Y%m%d_%H%M%S_summary.json"))
+        with open(summary_path, "w", encoding="utf-8") as f:
+            json.dump(totals, f, ensure_ascii=False, indent=2)
+    except OSError as e:
+        logger.error(f"本轮网络耗时汇总写入失败：{str(e)}")
+    return totals
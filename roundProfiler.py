@@ -0,0 +1,173 @@
+import os
+import sys
+import json
+import time
+import cProfile
+import logging
+import tracemalloc
+from collections import defaultdict
+from datetime import datetime
+
+PROFILE_DIR = "./profile_output"  # 每轮性能分析产物的输出目录
+PROFILE_DIR_MAX_BYTES = 200 * 1024 * 1024  # 输出目录体积上限（超出后删除最旧的文件）
+TRACEMALLOC_TOP_N = 25  # 内存分配快照中保留的前N条
+TRACKED_SOURCES = ("webClick.py", "timeSelect.py")  # 统计WebDriver命令时，按这些文件中的调用函数分组
+logger = logging.getLogger("BookingChecker")
+
+
+class WebDriverCommandCounter:
+    """统计一轮内发往chromedriver的命令（按命令类型、按webClick/timeSelect中的调用函数分组）"""
+
+    def __init__(self):
+        self.by_command = defaultdict(lambda: {"count": 0, "seconds": 0.0})
+        self.by_caller = defaultdict(lambda: {"count": 0, "seconds": 0.0})
+        self._original_execute = None
+
+    def install(self):
+        # 所有WebDriver/WebElement命令最终都经过 RemoteWebDriver.execute，在类上替换即可覆盖uc.Chrome
+        from selenium.webdriver.remote.webdriver import WebDriver as RemoteWebDriver
+
+        original_execute = RemoteWebDriver.execute
+        counter = self
+
+        def counted_execute(driver, driver_command, params=None):
+            command_type, caller = counter._classify(driver_command)
+            started = time.perf_counter()
+            try:
+                return original_execute(driver, driver_command, params)
+            finally:
+                elapsed = time.perf_counter() - started
+                for bucket in (counter.by_command[command_type], counter.by_caller[caller]):
+                    bucket["count"] += 1
+                    bucket["seconds"] += elapsed
+
+        self._original_execute = original_execute
+        RemoteWebDriver.execute = counted_execute
+
+    def uninstall(self):
+        if self._original_execute is None:
+            return
+        from selenium.webdriver.remote.webdriver import WebDriver as RemoteWebDriver
+        RemoteWebDriver.execute = self._original_execute
+        self._original_execute = None
+
+    @staticmethod
+    def _classify(driver_command):
+        """
+        根据调用栈确定命令类型与调用函数
+        命令类型取最外层的selenium公开方法（find_element、get_attribute、execute_script、click等），
+        这样get_attribute内部转发的脚本调用仍记为get_attribute；找不到时使用原始命令名
+        """
+        command_type = None
+        caller = "other"
+        frame = sys._getframe(2)
+        while frame is not None:
+            filename = frame.f_code.co_filename.replace("\\", "/")
+            func_name = frame.f_code.co_name
+            if "selenium/webdriver/remote/" in filename and not func_name.startswith("_") and func_name != "execute":
+                command_type = func_name
+            basename = os.path.basename(filename)
+            if basename in TRACKED_SOURCES:
+                caller = f"{basename}:{func_name}"
+                break
+            frame = frame.f_back
+        return command_type or driver_command, caller
+
+    def to_dict(self):
+        def _sorted(stats):
+            return dict(sorted(stats.items(), key=lambda item: item[1]["count"], reverse=True))
+
+        return {
+            "total_commands": sum(item["count"] for item in self.by_command.values()),
+            "total_seconds": round(sum(item["seconds"] for item in self.by_command.values()), 3),
+            "by_command": _sorted(self.by_command),
+            "by_caller": _sorted(self.by_caller),
+        }
+
+
+class RoundProfiler:
+    """
+    单轮检测的性能分析上下文：cProfile + tracemalloc + WebDriver命令计数
+    用法：with RoundProfiler(): run_single_check(...)
+    """
+
+    def __init__(self, output_dir=PROFILE_DIR, max_bytes=PROFILE_DIR_MAX_BYTES):
+        self.output_dir = output_dir
+        self.max_bytes = max_bytes
+        self.profiler = cProfile.Profile()
+        self.counter = WebDriverCommandCounter()
+        self._started_tracemalloc = False
+        self._round_name = ""
+        self._started_at = 0.0
+
+    def __enter__(self):
+        os.makedirs(self.output_dir, exist_ok=True)
+        self._round_name = datetime.now().strftime("round_%Y%m%d_%H%M%S")
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+        try:
+            self.counter.install()
+        except ImportError:
+            logger.warning("未安装selenium，本轮不统计WebDriver命令")
+        self._started_at = time.perf_counter()
+        self.profiler.enable()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.profiler.disable()
+        elapsed = time.perf_counter() - self._started_at
+        self.counter.uninstall()
+        snapshot = tracemalloc.take_snapshot()
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+        try:
+            self._write_artifacts(snapshot, elapsed)
+            prune_output_dir(self.output_dir, self.max_bytes)
+        except OSError as e:
+            logger.error(f"性能分析结果写入失败：{str(e)}")
+        return False  # 不吞掉本轮的异常
+
+    def _write_artifacts(self, snapshot, elapsed):
+        base_path = os.path.join(self.output_dir, self._round_name)
+
+        # 1. cProfile原始数据（可用 snakeviz / pstats 查看）
+        self.profiler.dump_stats(f"{base_path}.prof")
+
+        # 2. tracemalloc 分配最多的代码行
+        top_stats = snapshot.filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        )).statistics("lineno")
+        with open(f"{base_path}_memory.txt", "w", encoding="utf-8") as f:
+            f.write(f"Top {TRACEMALLOC_TOP_N} allocations ({self._round_name})\n")
+            for index, stat in enumerate(top_stats[:TRACEMALLOC_TOP_N], start=1):
+                f.write(f"#{index}: {stat}\n")
+
+        # 3. WebDriver命令统计
+        webdriver_stats = self.counter.to_dict()
+        webdriver_stats["round_seconds"] = round(elapsed, 3)
+        with open(f"{base_path}_webdriver.json", "w", encoding="utf-8") as f:
+            json.dump(webdriver_stats, f, ensure_ascii=False, indent=2)
+
+        logger.info(
+            f"本轮性能分析已保存：{base_path}.*（耗时{elapsed:.1f}秒，"
+            f"WebDriver命令{webdriver_stats['total_commands']}次，共{webdriver_stats['total_seconds']}秒）"
+        )
+
+
+def prune_output_dir(output_dir, max_bytes):
+    """输出目录超过体积上限时，按修改时间从旧到新删除文件"""
+    entries = []
+    for name in os.listdir(output_dir):
+        path = os.path.join(output_dir, name)
+        if os.path.isfile(path):
+            stat = os.stat(path)
+            entries.append((stat.st_mtime, stat.st_size, path))
+    total_bytes = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total_bytes <= max_bytes:
+            break
+        os.remove(path)
+        total_bytes -= size
@@ -0,0 +1,91 @@
+import time
+import logging
+import adaptiveTimeout
+from selenium.common import TimeoutException
+from selenium.webdriver.support.ui import WebDriverWait
+
+TASK_TIME_BUDGET = 180  # 单行任务的时间预算（秒），超出后取消任务并标记为待重试
+ROUND_TIME_BUDGET = 900  # 单轮检测的时间预算（秒），超出后本轮剩余行留到下一轮
+TASK_START_RESERVE = 30  # 本轮剩余时间少于此值时不再开始新任务（浏览器启动耗时无法被预算中断）
+logger = logging.getLogger("BookingChecker")
+
+
+class TaskTimeoutError(Exception):
+    """任务超出时间预算（浏览器需重置，该行留待重试，而不是执行失败）"""
+    pass
+
+
+class Deadline:
+    """基于单调时钟的截止时间；流程内所有等待/休眠都不会超过它"""
+
+    def __init__(self, seconds, name="任务", parent=None):
+        self.name = name
+        expires_at = time.monotonic() + seconds
+        # 子预算不能超过父预算（例如单行任务不能超过本轮剩余时间）
+        if parent is not None:
+            expires_at = min(expires_at, parent.expires_at)
+        self.expires_at = expires_at
+
+    def remaining(self):
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self):
+        return self.remaining() <= 0
+
+    def check(self):
+        if self.expired():
+            raise TaskTimeoutError(f"{self.name}超出时间预算")
+
+    def bound(self, timeout):
+        """把单次等待的超时时间截断到剩余预算内"""
+        self.check()
+        return min(timeout, self.remaining())
+
+    def sleep(self, seconds):
+        bounded = self.bound(seconds)
+        time.sleep(bounded)
+        if bounded < seconds:
+            raise TaskTimeoutError(f"{self.name}超出时间预算")
+
+
+class BudgetWait(WebDriverWait):
+    """
+    WebDriverWait 的预算版本：超时时间截断到剩余预算内
+    因剩余预算不足而超时时抛出 TaskTimeoutError，正常超时仍抛出 TimeoutException
+    指定step时，超时取自该步骤学习到的耗时（传入的timeout作为样本不足时的默认值，上限见adaptiveTimeout），并记录本次成功等待的耗时
+    """
+
+    def __init__(self, driver, timeout, deadline=None, step=None):
+        self.deadline = deadline
+        self.step = step
+        self.truncated = False
+        if step is not None:
+            timeout = adaptiveTimeout.learned_timeouts().timeout(step, timeout)
+        if deadline is not None:
+            bounded = deadline.bound(timeout)
+            self.truncated = bounded < timeout
+            timeout = bounded
+        self.timeout = timeout
+        super().__init__(driver, timeout)
+
+    def until(self, method, message=""):
+        started = time.monotonic()
+        try:
+            result = super().until(method, message)
+        except TimeoutException as e:
+            if self.truncated:
+                raise TaskTimeoutError(f"{self.deadline.name}超出时间预算") from e
+            if self.step is not None:
+                adaptiveTimeout.learned_timeouts().record_timeout(self.step)
+            raise
+        if self.step is not None:
+            adaptiveTimeout.learned_timeouts().record(self.step, time.monotonic() - started)
+        return result
+
+
+def pause(seconds, deadline=None):
+    """time.sleep 的预算版本"""
+    if deadline is None:
+        time.sleep(seconds)
+    else:
+        deadline.sleep(seconds)
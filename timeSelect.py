@@ -1,15 +1,14 @@
-import time
 from datetime import datetime
 from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 import logging
+from taskBudget import BudgetWait, TaskTimeoutError, pause
 
-WAIT_TIME = 20  # 延长等待时间到20秒，确保元素加载
+WAIT_TIME = 20  # 延长等待时间到20秒，确保元素加载（默认值，积累样本后改用学习到的超时）
 logger = logging.getLogger("BookingChecker")  # 这行是核心，必须加！
 
 
-def select_earliest_in_range(driver, start_date, end_date, daily_start_time, daily_end_time):
+def select_earliest_in_range(driver, start_date, end_date, daily_start_time, daily_end_time, deadline=None):
     """
     在指定日期和时间范围内选择最早可用的时段
     :param driver: WebDriver实例
@@ -17,18 +16,19 @@ def select_earliest_in_range(driver, start_date, end_date, daily_start_time, dai
     :param end_date: 结束日期（date对象）
     :param daily_start_time: 每天开始时间（time对象）
     :param daily_end_time: 每天结束时间（time对象）
+    :param deadline: 任务截止时间（taskBudget.Deadline），超出时抛出TaskTimeoutError
     :return: 是否成功选择
     """
     try:
         # 获取所有行数据并筛选符合条件的时段
-        rows = WebDriverWait(driver, WAIT_TIME).until(
+        rows = BudgetWait(driver, WAIT_TIME, deadline, step="slot_rows").until(
             EC.presence_of_all_elements_located((By.XPATH, '//tbody[@id="slotSelectionForm:slotTable_data"]/tr'))
         )
         valid_slots = []
 
         for row in rows:
             # 提取时间文本（确保元素可见）
-            time_label = WebDriverWait(row, WAIT_TIME).until(
+            time_label = BudgetWait(row, WAIT_TIME, deadline, step="slot_label").until(
                 EC.visibility_of_element_located((By.XPATH, './td[2]/label'))
             )
             time_text = time_label.text.strip()
@@ -68,14 +68,14 @@ def select_earliest_in_range(driver, start_date, end_date, daily_start_time, dai
 
         # 定位目标行并激活
         row_xpath = f'//tbody[@id="slotSelectionForm:slotTable_data"]/tr[@data-ri="{data_ri}"]'
-        target_row = WebDriverWait(driver, WAIT_TIME).until(
+        target_row = BudgetWait(driver, WAIT_TIME, deadline, step="slot_row_clickable").until(
             EC.element_to_be_clickable((By.XPATH, row_xpath))
         )
         driver.execute_script("arguments[0].click();", target_row)
-        time.sleep(0.5)
+        pause(0.5, deadline)
 
         # 修改隐藏字段值，模拟选中状态
-        hidden_input = WebDriverWait(driver, WAIT_TIME).until(
+        hidden_input = BudgetWait(driver, WAIT_TIME, deadline, step="slot_selection_input").until(
             EC.presence_of_element_located((By.ID, "slotSelectionForm:slotTable_selection"))
         )
 
@@ -90,6 +90,8 @@ def select_earliest_in_range(driver, start_date, end_date, daily_start_time, dai
         print(f"已选择最早时段：{earliest_text}")
         return True, earliest_text  # 返回是否成功和选中的时间
 
+    except TaskTimeoutError:
+        raise
     except Exception as e:
         logger.error(f"时间选择错误：{str(e)}")
         return False
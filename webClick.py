@@ -1,14 +1,16 @@
 import undetected_chromedriver as uc
-from selenium.common import StaleElementReferenceException
+from selenium.common import StaleElementReferenceException, TimeoutException, SessionNotCreatedException
 from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
+import os
 import time
 from selenium.webdriver.common.action_chains import ActionChains
 from datetime import datetime
 import timeSelect
+import networkCapture
+import driverManager
+from taskBudget import BudgetWait, TaskTimeoutError, pause
 import logging
-from selenium.webdriver.chrome.service import Service  # 新增：导入Service类
 # 首先在文件顶部添加邮件相关依赖
 import smtplib
 from email.mime.text import MIMEText
@@ -68,8 +70,11 @@ def send_booking_success_email(config_data, booking_time):
         return False
 
 
-TARGET_URL = "https://www.service.transport.qld.gov.au/SBSExternal/application/CleanBookingDE.xhtml"
-WAIT_TIME = 10
+# 可通过环境变量 BOOKING_TARGET_URL 指向本地替身服务器（用于测试网络耗时采集等）
+TARGET_URL = os.environ.get(
+    "BOOKING_TARGET_URL", "https://www.service.transport.qld.gov.au/SBSExternal/application/CleanBookingDE.xhtml"
+)
+WAIT_TIME = 10  # 默认等待超时；各步骤积累足够样本后改用学习到的超时（见adaptiveTimeout）
 logger = logging.getLogger("BookingChecker")  # 这行是核心，必须加！
 
 # 从Excel读取的配置信息（需要在调用时传入）
@@ -89,7 +94,44 @@ INPUT_DATA = {
 }
 
 
-def openweb(start_date, end_date, daily_start_time, daily_end_time, config_data):
+# 批量填写表单：一次execute_script设置所有字段，并触发PrimeFaces监听的input/change/blur事件
+# 返回未能写入的字段ID（元素不存在或值被页面改写），由调用方逐个用send_keys回退
+FILL_FORM_SCRIPT = """
+var values = arguments[0];
+var failed = [];
+for (var id in values) {
+    var el = document.getElementById(id);
+    if (!el) { failed.push(id); continue; }
+    el.value = values[id];
+    ['input', 'change', 'blur'].forEach(function (type) {
+        el.dispatchEvent(new Event(type, {bubbles: true}));
+    });
+    if (el.value !== String(values[id])) { failed.push(id); }
+}
+return failed;
+"""
+
+
+def fill_form(driver, field_values):
+    """
+    批量填写表单（替代逐字段的 find_element + clear + send_keys）
+    :param driver: WebDriver实例
+    :param field_values: 元素ID -> 填写值
+    :return: 填写耗时（秒）
+    """
+    started = time.perf_counter()
+    failed_ids = driver.execute_script(FILL_FORM_SCRIPT, field_values) or []
+    # 脚本未能写入的字段（如带输入掩码的控件）逐个回退为模拟键盘输入
+    for element_id in failed_ids:
+        element = driver.find_element(By.ID, element_id)
+        element.clear()
+        element.send_keys(field_values[element_id])
+    elapsed = time.perf_counter() - started
+    logger.info(f"表单填写完成：{len(field_values)}个字段（回退send_keys {len(failed_ids)}个），耗时{elapsed:.2f}秒")
+    return elapsed
+
+
+def openweb(start_date, end_date, daily_start_time, daily_end_time, config_data, deadline=None, capture_network=False):
     """
     打开网页并完成预约流程
     :param start_date: 预约开始日期（date对象）
@@ -97,6 +139,8 @@ def openweb(start_date, end_date, daily_start_time, daily_end_time, config_data)
     :param daily_start_time: 每天开始时间（time对象）
     :param daily_end_time: 每天结束时间（time对象）
     :param config_data: 从Excel读取的配置信息字典
+    :param deadline: 任务截止时间（taskBudget.Deadline），流程内所有等待都不会超过它；超出时抛出TaskTimeoutError
+    :param capture_network: 是否采集网络请求耗时（按流程步骤归类，输出HAR文件，见networkCapture）
     """
     # 更新全局配置数据
     global INPUT_DATA
@@ -112,51 +156,62 @@ def openweb(start_date, end_date, daily_start_time, daily_end_time, config_data)
     chrome_options.add_argument('--no-sandbox')  # 禁用沙箱（提升速度）
     chrome_options.add_argument('--disable-dev-shm-usage')  # 避免共享内存不足
     chrome_options.add_argument('--ignore-certificate-errors')  # 忽略证书错误（加速加载）
+    if capture_network:
+        networkCapture.enable_performance_log(chrome_options)  # 开启DevTools网络日志
 
-    driver_service = Service(executable_path=r"chrome\chromedriver.exe")  # 注意：路径用r开头避免转义
+    # chromedriver按Chrome版本缓存在本地，路径可按平台配置（见driverManager.DRIVER_CONFIG）
+    driver_path, version_main = driverManager.get_driver()
 
     # 启动后台浏览器（其他代码不变）
-    driver = uc.Chrome(service=driver_service, options=chrome_options)
+    try:
+        driver = uc.Chrome(options=chrome_options, driver_executable_path=driver_path, version_main=version_main)
+    except SessionNotCreatedException:
+        # 通常是Chrome已自动更新、chromedriver版本不匹配：丢弃已解析的driver，下次启动重新解析
+        driverManager.invalidate()
+        raise
+    capture = networkCapture.NetworkCapture(driver, enabled=capture_network)
 
-    driver.get(TARGET_URL)  # 后续操作正常执行，无界面显示
-    logger.info("已启动隐藏自动化特征的浏览器，正在访问网站...")
     try:
+        capture.begin_step("landing")
+        # 页面加载同样受任务时间预算约束（Chrome默认页面加载超时为300秒）
+        if deadline is not None:
+            driver.set_page_load_timeout(deadline.bound(deadline.remaining()))
+        try:
+            driver.get(TARGET_URL)  # 后续操作正常执行，无界面显示
+        except TimeoutException as e:
+            if deadline is not None:
+                raise TaskTimeoutError(f"{deadline.name}超出时间预算") from e
+            raise
+        logger.info("已启动隐藏自动化特征的浏览器，正在访问网站...")
         # 点击继续按钮
 
 
-        continue_btn = WebDriverWait(driver, WAIT_TIME).until(
+        continue_btn = BudgetWait(driver, WAIT_TIME, deadline, step="start_button").until(
             EC.element_to_be_clickable((By.CLASS_NAME, "ui-button"))
         )
+        capture.begin_step("licence_details")
         continue_btn.click()
 
         # 输入驾照编号
-        dl_input = WebDriverWait(driver, WAIT_TIME).until(
+        BudgetWait(driver, WAIT_TIME, deadline, step="licence_form").until(
             EC.presence_of_element_located((By.ID, "CleanBookingDEForm:dlNumber"))
         )
-        dl_input.clear()
-        dl_input.send_keys(INPUT_DATA["dlNumber"])
-        logger.info("已输入驾照编号")
-
-        # 输入联系人姓名
-        contact_input = driver.find_element(By.ID, "CleanBookingDEForm:contactName")
-        contact_input.clear()
-        contact_input.send_keys(INPUT_DATA["contactName"])
-        logger.info("已输入联系人姓名")
-
-        # 输入手机号
-        contactPhone = driver.find_element(By.ID, "CleanBookingDEForm:contactPhone")
-        contactPhone.clear()
-        contactPhone.send_keys(INPUT_DATA["contactPhone"])
-        logger.info("已输入手机号")
+        # 批量填写驾照编号、联系人姓名、手机号
+        fill_form(driver, {
+            "CleanBookingDEForm:dlNumber": INPUT_DATA["dlNumber"],
+            "CleanBookingDEForm:contactName": INPUT_DATA["contactName"],
+            "CleanBookingDEForm:contactPhone": INPUT_DATA["contactPhone"],
+        })
+        logger.info("已输入驾照编号、联系人姓名、手机号")
 
         # 选择考试类型
         try:
-            dropdown_button = WebDriverWait(driver, WAIT_TIME).until(
+            dropdown_button = BudgetWait(driver, WAIT_TIME, deadline, step="test_type_dropdown").until(
                 EC.element_to_be_clickable((By.ID, "CleanBookingDEForm:productType"))
             )
             dropdown_button.click()
 
-            target_option = WebDriverWait(driver, WAIT_TIME).until(
+            target_option = BudgetWait(driver, WAIT_TIME, deadline, step="test_type_option").until(
                 EC.visibility_of_element_located((
                     By.XPATH,
                     f'//ul[@id="CleanBookingDEForm:productType_items"]/li[text()="{INPUT_DATA["Test type"]}"]'
@@ -171,22 +226,25 @@ def openweb(start_date, end_date, daily_start_time, daily_end_time, config_data)
             raise
 
         # 继续到下一步
-        dropdown_button1 = WebDriverWait(driver, WAIT_TIME).until(
+        dropdown_button1 = BudgetWait(driver, WAIT_TIME, deadline, step="licence_continue").until(
             EC.element_to_be_clickable((By.CLASS_NAME, "btn-success"))
         )
+        capture.begin_step("licence_submit")
         dropdown_button1.click()
-        dropdown_button2 = WebDriverWait(driver, WAIT_TIME).until(
+        dropdown_button2 = BudgetWait(driver, WAIT_TIME, deadline, step="booking_confirm").until(
             EC.element_to_be_clickable((By.ID, "BookingConfirmationForm:actionFieldList:confirmButtonField"
                                                ":confirmButton"))
         )
+        capture.begin_step("booking_confirm")
         dropdown_button2.click()
         # 选择地区
         try:
-            dropdown_button = WebDriverWait(driver, WAIT_TIME).until(
+            dropdown_button = BudgetWait(driver, WAIT_TIME, deadline, step="region_dropdown").until(
                 EC.element_to_be_clickable((By.ID, "BookingSearchForm:region_label"))
             )
+            capture.begin_step("region")
             dropdown_button.click()
-            target_option = WebDriverWait(driver, WAIT_TIME).until(
+            target_option = BudgetWait(driver, WAIT_TIME, deadline, step="region_option").until(
                 EC.visibility_of_element_located((
                     By.XPATH,
                     f'//ul[@id="BookingSearchForm:region_items"]/li[text()="{INPUT_DATA["Region"]}"]'
@@ -202,12 +260,13 @@ def openweb(start_date, end_date, daily_start_time, daily_end_time, config_data)
 
         # 选择考试中心
         try:
-            time.sleep(1)
-            dropdown_button = WebDriverWait(driver, WAIT_TIME).until(
+            pause(1, deadline)
+            dropdown_button = BudgetWait(driver, WAIT_TIME, deadline, step="centre_dropdown").until(
                 EC.element_to_be_clickable((By.ID, "BookingSearchForm:centre"))
             )
+            capture.begin_step("centre")
             dropdown_button.click()
-            target_option = WebDriverWait(driver, WAIT_TIME).until(
+            target_option = BudgetWait(driver, WAIT_TIME, deadline, step="centre_option").until(
                 EC.visibility_of_element_located((
                     By.XPATH,
                     f'//ul[@id="BookingSearchForm:centre_items"]/li[text()="{INPUT_DATA["Centre"]}"]'
@@ -222,79 +281,79 @@ def openweb(start_date, end_date, daily_start_time, daily_end_time, config_data)
             raise
 
         # 继续到时间选择页面
-        continue_btn = WebDriverWait(driver, WAIT_TIME).until(
+        continue_btn = BudgetWait(driver, WAIT_TIME, deadline, step="centre_continue").until(
             EC.element_to_be_clickable((By.CLASS_NAME, "btn-success"))
         )
+        capture.begin_step("slot_search")
         continue_btn.click()
 
         # 等待预约表格加载
         logger.info("\n等待预约时间表格加载...")
-        WebDriverWait(driver, WAIT_TIME).until(
+        BudgetWait(driver, WAIT_TIME, deadline, step="slot_table").until(
             EC.visibility_of_element_located((By.ID, "slotSelectionForm:slotTable"))
         )
         # 调用时间选择函数，选择范围内最早的时间
+        capture.begin_step("slot_select")
         success, selected_time = timeSelect.select_earliest_in_range(
             driver=driver,
             start_date=start_date,
             end_date=end_date,
             daily_start_time=daily_start_time,
-            daily_end_time=daily_end_time
+            daily_end_time=daily_end_time,
+            deadline=deadline
         )
         if not success:
             logger.info(f"{datetime.now()} 未在指定范围内找到可用时段")
             print(f"{datetime.now()} 未在指定范围内找到可用时段")
             return False
         # 成功选中后进入下一页
-        continue_btn5 = WebDriverWait(driver, WAIT_TIME).until(
+        continue_btn5 = BudgetWait(driver, WAIT_TIME, deadline, step="slot_continue").until(
             EC.element_to_be_clickable((By.ID, "slotSelectionForm:actionFieldList:confirmButtonField:confirmButton"))
         )
+        capture.begin_step("slot_confirm")
         continue_btn5.click()
 
-        wait = WebDriverWait(driver, 10)
+        wait = BudgetWait(driver, 10, deadline, step="slot_confirm")
         element = wait.until(EC.element_to_be_clickable((By.ID, "BookingConfirmationForm:actionFieldList:confirmButtonField:confirmButton")))
+        capture.begin_step("payment_options")
         element.click()  # 此时元素一定存在于当前DOM中
-        time.sleep(1)
+        pause(1, deadline)
         # 填写邮箱
-        contactEmail = driver.find_element(By.ID,"paymentOptionSelectionForm:paymentOptions:emailAddressField:emailAddress")
-        contactEmail.clear()
-        contactEmail.send_keys(INPUT_DATA["contactEmail"])
+        fill_form(driver, {
+            "paymentOptionSelectionForm:paymentOptions:emailAddressField:emailAddress": INPUT_DATA["contactEmail"],
+        })
         logger.info("已输入邮箱")
-        continue_btn1 = WebDriverWait(driver, WAIT_TIME).until(
+        continue_btn1 = BudgetWait(driver, WAIT_TIME, deadline, step="email_continue").until(
             EC.element_to_be_clickable((By.CLASS_NAME, "btn-success"))
         )
+        capture.begin_step("payment_page")
         continue_btn1.click()
-        time.sleep(1)
+        pause(1, deadline)
 
         # 填写付款信息
-        contactCard = driver.find_element(By.ID, "CardNumber")
-        contactCard.clear()
-        contactCard.send_keys(INPUT_DATA["CardNumber"])
-
-        contactMonth = driver.find_element(By.ID, "ExpiryMonth")
-        contactMonth.clear()
-        contactMonth.send_keys(INPUT_DATA["ExpiryMonth"])
-
-        contactYear = driver.find_element(By.ID, "ExpiryYear")
-        contactYear.clear()
-        contactYear.send_keys(INPUT_DATA["ExpiryYear"])
-
-        contactCVN = driver.find_element(By.ID, "CVN")
-        contactCVN.clear()
-        contactCVN.send_keys(INPUT_DATA["CVN"])
+        fill_form(driver, {
+            "CardNumber": INPUT_DATA["CardNumber"],
+            "ExpiryMonth": INPUT_DATA["ExpiryMonth"],
+            "ExpiryYear": INPUT_DATA["ExpiryYear"],
+            "CVN": INPUT_DATA["CVN"],
+        })
         logger.info("已填写付款信息，准备提交付款")
         # ---------------------- 新增：付款按钮点击 + 结果判断 ----------------------
         payment_success = False  # 付款结果标识（默认失败）
         try:
+            # 付款阶段的等待固定使用WAIT_TIME：不参与超时学习，也不受任务时间预算约束（付款一旦开始不能被中断或重试）
             # 1. 点击付款审核按钮（btnReviewPayment）
-            continue_btn = WebDriverWait(driver, WAIT_TIME).until(
+            continue_btn = BudgetWait(driver, WAIT_TIME).until(
                 EC.element_to_be_clickable((By.ID, "btnReviewPayment"))  # 等待按钮可点击，避免未加载完成
             )
+            capture.begin_step("review_payment")
             continue_btn.click()
 
             logger.info("已点击付款审核按钮，等待付款结果...")
-            continue_btn1 = WebDriverWait(driver, WAIT_TIME).until(
+            continue_btn1 = BudgetWait(driver, WAIT_TIME).until(
                 EC.element_to_be_clickable((By.XPATH, "//button[text()='PAY']"))  # 精准匹配“PAY”文本的按钮
             )
+            capture.begin_step("pay")
             continue_btn1.click()
             # 2. 判断是否付款成功（核心：等待成功标识元素，超时则视为失败）
             # 若能走到这一步，说明成功找到成功元素
@@ -318,7 +377,7 @@ def openweb(start_date, end_date, daily_start_time, daily_end_time, config_data)
             # 原有：最后一步按钮点击（通常是“确认”或“完成”，即使付款失败也可能需要点击关闭）
             try:
                 # 等待最后一步按钮可点击（根据实际ID调整，若没有可删除）
-                final_btn = WebDriverWait(driver, WAIT_TIME).until(
+                final_btn = BudgetWait(driver, WAIT_TIME).until(
                     EC.element_to_be_clickable((By.CLASS_NAME, "button"))
                 )
                 final_btn.click()
@@ -327,6 +386,7 @@ def openweb(start_date, end_date, daily_start_time, daily_end_time, config_data)
                 logger.warning(f"最后一步按钮点击异常：{str(e)}")
 
             # 关闭浏览器（原有逻辑）
+            capture.close()
             driver.quit()
 
         # ---------------------- 关键：返回付款结果（决定Excel状态） ----------------------
@@ -337,8 +397,12 @@ def openweb(start_date, end_date, daily_start_time, daily_end_time, config_data)
 
 
 
+    except TaskTimeoutError as e:
+        logger.warning(f"任务已取消：{e}，关闭浏览器，等待重试")
+        raise
     except Exception as e:
         logger.info(f"脚本出错：{e}")
         return False
     finally:
+        capture.close()
         driver.quit()